@@ -5,8 +5,12 @@ import os
 from dotenv import load_dotenv
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime, time, timedelta, timezone
+from datetime import date, datetime, time, timedelta, timezone
 import re
+import asyncio
+import csv
+import gzip
+import io
 
 # -------------------- 初期設定 --------------------
 
@@ -66,6 +70,9 @@ TIME_REACTION_MAP = {
 # グループ参加用の絵文字
 GROUP_REACTION_EMOJI = '✋'
 
+# 集計シートのキャッシュ保持時間（秒）
+LOG_CACHE_TTL_SECONDS = 60
+
 # -------------------- ヘルパー関数 --------------------
 
 def parse_time_to_minutes(time_str: str) -> int:
@@ -79,6 +86,162 @@ def parse_time_to_minutes(time_str: str) -> int:
         minutes = int(minute_match.group(1))
     return int(hours * 60 + minutes)
 
+# -------------------- 集計シートのキャッシュ --------------------
+
+_log_records_cache = None      # (取得時刻, レコード一覧)
+_log_records_inflight = None   # 実行中の読み取りタスク
+_log_records_generation = 0    # 書き込みのたびに増える世代番号
+
+async def _fetch_log_records():
+    """集計シートを別スレッドで読み取り、世代が変わっていなければキャッシュに保存する"""
+    global _log_records_cache, _log_records_inflight
+    generation = _log_records_generation
+    loop = asyncio.get_running_loop()
+    try:
+        records = await asyncio.to_thread(log_worksheet.get_all_records)
+        # 読み取り中にBot自身の書き込みがあった場合は古いデータなので保存しない
+        if generation == _log_records_generation:
+            _log_records_cache = (loop.time(), records)
+        return records
+    finally:
+        if _log_records_inflight is asyncio.current_task():
+            _log_records_inflight = None
+
+async def get_log_records():
+    """
+    集計シートの全レコードを取得する
+    同時に呼ばれた場合は1回の読み取りを共有し、結果はLOG_CACHE_TTL_SECONDSの間キャッシュする
+    返したリストは共有されるので、呼び出し側で変更しないこと
+    """
+    global _log_records_inflight
+    loop = asyncio.get_running_loop()
+    if _log_records_cache and loop.time() - _log_records_cache[0] < LOG_CACHE_TTL_SECONDS:
+        return _log_records_cache[1]
+    if _log_records_inflight is None:
+        _log_records_inflight = asyncio.create_task(_fetch_log_records())
+    # 待っている1人がキャンセルされても、共有の読み取りは止めない
+    return await asyncio.shield(_log_records_inflight)
+
+def invalidate_log_records_cache():
+    """集計シートへ書き込んだ後に呼び、キャッシュと実行中の読み取りを破棄する"""
+    global _log_records_cache, _log_records_inflight, _log_records_generation
+    _log_records_cache = None
+    _log_records_inflight = None
+    _log_records_generation += 1
+
+# -------------------- シート書き込みの直列化 --------------------
+
+# 行番号を使う削除とその前の検索がほかの書き込みと混ざらないようにするためのロック
+sheet_write_lock = asyncio.Lock()
+
+async def run_sheet_write(func, *args):
+    """シートへの書き込み処理をロックを取ってから別スレッドで実行する"""
+    async with sheet_write_lock:
+        return await asyncio.to_thread(func, *args)
+
+async def run_log_sheet_write(func, *args):
+    """集計シートへの書き込みをrun_sheet_writeで実行し、成否にかかわらずキャッシュを破棄する"""
+    try:
+        return await run_sheet_write(func, *args)
+    finally:
+        # 失敗しても途中までシートに反映されている可能性があるので必ず破棄する
+        invalidate_log_records_cache()
+
+async def append_log_row(log_row: list):
+    """集計シートに1行追加する"""
+    await run_log_sheet_write(log_worksheet.append_row, log_row)
+
+def _find_row_values(worksheet, message_id: str) -> list | None:
+    """A列がmessage_idの行を探してその値を返す。見つからなければNoneを返す"""
+    cell = worksheet.find(message_id, in_column=1)
+    if not cell:
+        return None
+    return worksheet.row_values(cell.row)
+
+def _delete_user_log_rows(user_name: str, message_id: str) -> list[int]:
+    """集計シートから指定したユーザーとメッセージの記録を削除し、削除した行番号を返す"""
+    # 行番号を使うのでキャッシュではなく最新を読む
+    all_logs = log_worksheet.get_all_records()
+
+    # 削除対象の行番号をリストアップする
+    rows_to_delete = []
+    # スプレッドシートの行番号は1から始まるので、iに2を加える
+    for i, log in enumerate(all_logs):
+        sheet_user_name = log.get('名前')
+        sheet_message_id = str(log.get('Message ID', ''))
+
+        if sheet_user_name == user_name and sheet_message_id == message_id:
+            rows_to_delete.append(i + 2)
+
+    # 見つかった行を後ろから順番に削除する
+    rows_to_delete.sort(reverse=True)
+    for row_num in rows_to_delete:
+        log_worksheet.delete_rows(row_num)
+    return rows_to_delete
+
+def _delete_group_log(message_id: str) -> bool:
+    """/logメッセージに関連する記録と管理用の行を削除する。対象がなければFalseを返す"""
+    # GroupLogsシートから、削除されたメッセージの情報を探す
+    group_log_cell = group_log_worksheet.find(message_id, in_column=1)
+    if not group_log_cell:
+        return False
+
+    # 作業記録シート(シート1)から、関連するログを全て削除
+    all_log_cells = log_worksheet.findall(message_id, in_column=7) # G列(Message ID)を検索
+    # 見つかった行を逆順に削除 (行がずれるのを防ぐため)
+    for cell in reversed(all_log_cells):
+        log_worksheet.delete_rows(cell.row)
+
+    # GroupLogsシートからも管理用の行を削除
+    group_log_worksheet.delete_rows(group_log_cell.row)
+    return True
+
+def _delete_schedule(message_id: str) -> bool:
+    """/scheduleメッセージの行を削除する。対象がなければFalseを返す"""
+    schedule_cell = schedule_worksheet.find(message_id, in_column=1)
+    if not schedule_cell:
+        return False
+    schedule_worksheet.delete_rows(schedule_cell.row)
+    return True
+
+# -------------------- イベントの振り分け --------------------
+
+class MessageEventDispatcher:
+    """
+    リアクションやメッセージ削除のイベントをワーカーに振り分ける
+    同じmessage_idのイベントは必ず同じワーカーに入るので届いた順に処理され、
+    違うメッセージのイベントは別のワーカーで並行して処理される
+    """
+
+    def __init__(self, worker_count: int = 4):
+        self.worker_count = worker_count
+        self.queues = []
+        self.workers = []
+
+    def start(self):
+        """ワーカーを起動する (起動済みなら何もしない)"""
+        if self.workers:
+            return
+        self.queues = [asyncio.Queue() for _ in range(self.worker_count)]
+        self.workers = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+
+    def submit(self, message_id: int, handler, payload):
+        """message_idに対応するワーカーのキューにイベントを積む"""
+        self.start()
+        self.queues[message_id % self.worker_count].put_nowait((handler, payload))
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            handler, payload = await queue.get()
+            try:
+                await handler(payload)
+            except Exception as e:
+                print(f"イベント処理中にエラー: {e}")
+            finally:
+                queue.task_done()
+
+event_dispatcher = MessageEventDispatcher()
+
 # -------------------- Botのイベントハンドラ --------------------
 
 """
@@ -95,6 +258,7 @@ async def on_ready():
 async def on_ready():
     print(f'{client.user} としてログインしました')
     await tree.sync()
+    event_dispatcher.start()
     post_weekly_total.start()
     post_monthly_total.start()
 
@@ -122,7 +286,7 @@ async def generate_ranking_embed(period: str, top_n: int = 5, invoker_name: str
         return None
 
     try:
-        records = log_worksheet.get_all_records()
+        records = await get_log_records()
     except Exception as e:
         print(f"スプレッドシートの読み取りエラー: {e}")
         return discord.Embed(title="エラー", description="スプレッドシートのデータを取得できませんでした。", color=discord.Color.red())
@@ -209,7 +373,7 @@ async def calculate_total_hours(period: str):
         target_date_str = now.strftime('%Y/%m')
     
     try:
-        records = log_worksheet.get_all_records()
+        records = await get_log_records()
     except Exception as e:
         print(f"スプレッドシートの読み取りエラー: {e}")
         return -1 # エラーを示す値を返す
@@ -236,6 +400,77 @@ async def calculate_total_hours(period: str):
             
     return total_minutes
 
+def resolve_export_range(period: str, start_date: str | None, end_date: str | None) -> tuple[date | None, date | None]:
+    """
+    エクスポートする期間の開始日と終了日を返す (Noneは制限なし)
+    period: 'weekly', 'monthly', 'custom', 'all_time' のいずれか
+    customで日付の形式が不正な場合はValueErrorを送出する
+    """
+    today = datetime.now(JST).date()
+    if period == 'weekly':
+        return today - timedelta(days=today.weekday()), today
+    if period == 'monthly':
+        # /total_hours と同じく、今月の日付なら今日より後の予定日の記録も含める
+        start_of_month = today.replace(day=1)
+        start_of_next_month = (start_of_month + timedelta(days=32)).replace(day=1)
+        return start_of_month, start_of_next_month - timedelta(days=1)
+    if period == 'custom':
+        start = datetime.strptime(start_date, '%Y/%m/%d').date() if start_date else None
+        end = datetime.strptime(end_date, '%Y/%m/%d').date() if end_date else None
+        return start, end
+    return None, None
+
+def iter_log_records(records, start: date | None = None, end: date | None = None, user_name: str | None = None):
+    """期間とユーザーで絞り込んだ記録を1件ずつ返す"""
+    for record in records:
+        log_date_str = record.get('日付', '')
+        if not log_date_str: continue
+
+        if start or end:
+            try:
+                log_date = datetime.strptime(log_date_str, '%Y/%m/%d').date()
+            except ValueError:
+                continue
+            if start and log_date < start: continue
+            if end and log_date > end: continue
+
+        if user_name and record.get('名前') != user_name:
+            continue
+        yield record
+
+# Excelで数式として解釈されてしまうセルの先頭文字
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def escape_csv_cell(value):
+    """数式として解釈される文字で始まる文字列の先頭に ' を付ける"""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def build_export_file(rows, fieldnames: list[str], compress: bool = False) -> tuple[io.BytesIO, int]:
+    """
+    記録をCSV (compress=Trueならgzip圧縮) としてメモリ上のバッファに書き出す
+    rowsは1件ずつ書き込むので、全件をリストにまとめる必要はない
+    書き出したバッファと件数を返す
+    """
+    buffer = io.BytesIO()
+    raw = gzip.GzipFile(fileobj=buffer, mode='wb') if compress else buffer
+    # Excelで文字化けしないようにBOM付きUTF-8で書く
+    text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    writer = csv.DictWriter(text, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        # 作業内容やメモはメンバーが自由に入力するので、数式にならないようにする
+        writer.writerow({key: escape_csv_cell(value) for key, value in row.items()})
+        count += 1
+    text.flush()
+    text.detach() # バッファを閉じないように切り離す
+    if compress:
+        raw.close() # gzipの末尾を書き込む (bufferは閉じない)
+    buffer.seek(0)
+    return buffer, count
+
 # -------------------- スラッシュコマンドの実装 --------------------
 
 @tree.command(name="total_hours", description="チーム全体の合計作業時間を表示します。")
@@ -272,6 +507,82 @@ async def total_hours(interaction: discord.Interaction, period: app_commands.Cho
     )
     await interaction.followup.send(embed=embed, ephemeral=True)
 
+@tree.command(name="export", description="作業記録をCSVファイルで出力します。")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True) # 全員の記録を出力できるので役員(サーバー管理権限)のみに限定
+@app_commands.describe(
+    period="出力する期間を選択してください",
+    start_date="期間指定の開始日 (例: 2025/07/01)",
+    end_date="期間指定の終了日 (例: 2025/07/31)",
+    user="特定のメンバーの記録だけを出力する場合に指定",
+    compress="gzipで圧縮する場合はTrue"
+)
+@app_commands.choices(period=[
+    app_commands.Choice(name="今週", value="weekly"),
+    app_commands.Choice(name="今月", value="monthly"),
+    app_commands.Choice(name="期間指定", value="custom"),
+    app_commands.Choice(name="累計", value="all_time"),
+])
+async def export(interaction: discord.Interaction, period: app_commands.Choice[str], start_date: str | None = None, end_date: str | None = None, user: discord.Member | None = None, compress: bool = False):
+    await interaction.response.defer(ephemeral=True)
+
+    if period.value != 'custom' and (start_date or end_date):
+        await interaction.followup.send("開始日・終了日は期間に「期間指定」を選んだときだけ入力してください。", ephemeral=True)
+        return
+    if period.value == 'custom' and not (start_date or end_date):
+        await interaction.followup.send("期間指定の場合は開始日か終了日を入力してください。", ephemeral=True)
+        return
+    try:
+        start, end = resolve_export_range(period.value, start_date, end_date)
+    except ValueError:
+        await interaction.followup.send("日付は 2025/07/01 の形式で入力してください。", ephemeral=True)
+        return
+    if start and end and start > end:
+        await interaction.followup.send("開始日は終了日より前の日付を入力してください。", ephemeral=True)
+        return
+
+    try:
+        records = await get_log_records()
+    except Exception as e:
+        print(f"スプレッドシートの読み取りエラー: {e}")
+        await interaction.followup.send("エラーが発生し、記録を出力できませんでした。", ephemeral=True)
+        return
+
+    if not records:
+        await interaction.followup.send("まだ作業記録がありません。", ephemeral=True)
+        return
+
+    user_name = user.display_name if user else None
+    fieldnames = list(records[0].keys())
+    # 累計など件数が多い場合でもほかのコマンドを止めないよう別スレッドで書き出す
+    buffer, count = await asyncio.to_thread(build_export_file, iter_log_records(records, start, end, user_name), fieldnames, compress)
+
+    if count == 0:
+        await interaction.followup.send("該当する記録がありません。", ephemeral=True)
+        return
+
+    # サーバーのアップロード上限を超える場合はgzipで圧縮し直す
+    filesize_limit = interaction.guild.filesize_limit
+    message = f"📄 {count}件の記録を出力しました。"
+    if buffer.getbuffer().nbytes > filesize_limit and not compress:
+        compress = True
+        buffer, count = await asyncio.to_thread(build_export_file, iter_log_records(records, start, end, user_name), fieldnames, compress)
+        message += " (ファイルが大きいためgzipで圧縮しました)"
+    if buffer.getbuffer().nbytes > filesize_limit:
+        await interaction.followup.send("ファイルがアップロードできるサイズを超えています。期間やメンバーを絞り込んでください。", ephemeral=True)
+        return
+
+    filename = f"activity_log_{period.value}.csv" + (".gz" if compress else "")
+    try:
+        await interaction.followup.send(
+            message,
+            file=discord.File(buffer, filename=filename),
+            ephemeral=True
+        )
+    except discord.HTTPException as e:
+        print(f"エクスポートファイルの送信エラー: {e}")
+        await interaction.followup.send("エラーが発生し、ファイルを送信できませんでした。期間やメンバーを絞り込んでください。", ephemeral=True)
+
 """
 # 機能1: /rank コマンド 
 @tree.command(name="rank", description="作業時間のランキングを表示します。")
@@ -341,7 +652,7 @@ async def schedule(interaction: discord.Interaction, task: str, date: str):
         value="作業が終わったら、時間絵文字でリアクションしてください！"
     )
     schedule_message = await interaction.followup.send(embed=embed, wait=True)
-    schedule_worksheet.append_row([str(schedule_message.id), task, date])
+    await run_sheet_write(schedule_worksheet.append_row, [str(schedule_message.id), task, date])
     
 
 # 機能4: /log コマンド
@@ -371,7 +682,7 @@ async def log(interaction: discord.Interaction, task: str, time: str, note: str
     author_name = interaction.user.display_name
 
     # GroupLogsシートにこの作業を登録
-    group_log_worksheet.append_row([str(log_message.id), task, time_in_minutes, author_name])
+    await run_sheet_write(group_log_worksheet.append_row, [str(log_message.id), task, time_in_minutes, author_name])
     
     # 最初の報告者の記録をログシートに追加
     log_row = [
@@ -383,13 +694,13 @@ async def log(interaction: discord.Interaction, task: str, time: str, note: str
         datetime.now().isoformat(),
         str(log_message.id)
     ]
-    log_worksheet.append_row(log_row)
+    await append_log_row(log_row)
 
     # ユーザーのDM設定を確認
     should_send_dm = False
     try:
-        cell = user_settings_worksheet.find(str(interaction.user.id), in_column=1)
-        if cell and user_settings_worksheet.cell(cell.row, 2).value == 'TRUE':
+        cell = await asyncio.to_thread(user_settings_worksheet.find, str(interaction.user.id), in_column=1)
+        if cell and (await asyncio.to_thread(user_settings_worksheet.cell, cell.row, 2)).value == 'TRUE':
             should_send_dm = True
     except gspread.exceptions.CellNotFound:
         pass # 設定がなければDMは送らない
@@ -410,6 +721,13 @@ async def log(interaction: discord.Interaction, task: str, time: str, note: str
 
 @client.event
 async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
+    event_dispatcher.submit(payload.message_id, handle_reaction_add, payload)
+
+@client.event
+async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
+    event_dispatcher.submit(payload.message_id, handle_reaction_remove, payload)
+
+async def handle_reaction_add(payload: discord.RawReactionActionEvent):
     # Bot自身のリアクションや、ユーザー情報が取得できない場合は無視
     if payload.user_id == client.user.id: return
     user = await client.fetch_user(payload.user_id)
@@ -436,8 +754,8 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
 
     # ユーザーのDM設定を確認
     try:
-        cell = user_settings_worksheet.find(str(user.id), in_column=1)
-        if cell and user_settings_worksheet.cell(cell.row, 2).value == 'TRUE':
+        cell = await asyncio.to_thread(user_settings_worksheet.find, str(user.id), in_column=1)
+        if cell and (await asyncio.to_thread(user_settings_worksheet.cell, cell.row, 2)).value == 'TRUE':
             should_send_dm = True
     except gspread.exceptions.CellNotFound:
         pass # 設定がなければ何もしない (DMなし)
@@ -446,15 +764,15 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
 
     # --- パターン1: /schedule のメッセージへのリアクション ---
     try:
-        schedule_cell = schedule_worksheet.find(message_id, in_column=1)
+        # 検索から行の読み取りまでをロック内で行い、ほかのメッセージの削除で行がずれないようにする
+        schedule_data = await run_sheet_write(_find_row_values, schedule_worksheet, message_id)
         # スケジュールが見つかり、かつ、時間の絵文字なら記録
-        if schedule_cell and emoji in TIME_REACTION_MAP:
-            schedule_data = schedule_worksheet.row_values(schedule_cell.row)
+        if schedule_data and emoji in TIME_REACTION_MAP:
             task_name, task_date = schedule_data[1], schedule_data[2]
             time_in_minutes = TIME_REACTION_MAP[emoji]
             
             log_row = [user_name, task_date, task_name, f"{time_in_minutes}分", "", datetime.now().isoformat(), message_id]
-            log_worksheet.append_row(log_row)
+            await append_log_row(log_row)
             
             # DM設定がONの場合のみ送信
             if should_send_dm:
@@ -469,9 +787,8 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
 
     # --- パターン2: /log のメッセージへのリアクション ---
     try:
-        group_log_cell = group_log_worksheet.find(message_id, in_column=1)
-        if group_log_cell:
-            group_log_data = group_log_worksheet.row_values(group_log_cell.row)
+        group_log_data = await run_sheet_write(_find_row_values, group_log_worksheet, message_id)
+        if group_log_data:
             task_name = group_log_data[1]
             
             # ケースA: ✋ (参加)リアクションの場合
@@ -479,7 +796,7 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
                 original_time_in_minutes = int(group_log_data[2])
                 
                 log_row = [user_name, datetime.now().strftime('%Y/%m/%d'), task_name, f"{original_time_in_minutes}分", "(参加)", datetime.now().isoformat(), message_id]
-                log_worksheet.append_row(log_row)
+                await append_log_row(log_row)
 
                 # DM設定がONの場合のみ送信
                 if should_send_dm:
@@ -493,7 +810,7 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
                 new_time_in_minutes = TIME_REACTION_MAP[emoji]
                 
                 log_row = [user_name, datetime.now().strftime('%Y/%m/%d'), task_name, f"{new_time_in_minutes}分", "(別時間で参加)", datetime.now().isoformat(), message_id]
-                log_worksheet.append_row(log_row)
+                await append_log_row(log_row)
 
                 # DM設定がONの場合のみ送信
                 if should_send_dm:
@@ -508,8 +825,7 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
         print(f"グループリアクション処理中にエラー: {e}")
 
 
-@client.event
-async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
+async def handle_reaction_remove(payload: discord.RawReactionActionEvent):
     """リアクションが取り消された際に、その人の作業記録を削除する"""
     # Bot自身のリアクションは無視
     if payload.user_id == client.user.id:
@@ -530,23 +846,11 @@ async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
         print(f"--- リアクション取消検知 ---")
         print(f"探している人: {user_name_to_delete}, Message ID: {message_id_to_delete}")
 
-        # 作業記録シートの全データを取得
-        all_logs = log_worksheet.get_all_records()
-        
-        # 削除対象の行番号をリストアップする
-        rows_to_delete = []
-        # スプレッドシートの行番号は1から始まるので、iに2を加える
-        for i, log in enumerate(all_logs):
-            sheet_user_name = log.get('名前')
-            sheet_message_id = str(log.get('Message ID', ''))
-            
-            if sheet_user_name == user_name_to_delete and sheet_message_id == message_id_to_delete:
-                rows_to_delete.append(i + 2)
+        # 検索から削除までをロック内で行い、ほかの書き込みで行番号がずれないようにする
+        deleted_rows = await run_log_sheet_write(_delete_user_log_rows, user_name_to_delete, message_id_to_delete)
 
-        if rows_to_delete:
-            # 見つかった行を後ろから順番に削除する
-            for row_num in sorted(rows_to_delete, reverse=True):
-                log_worksheet.delete_rows(row_num)
+        if deleted_rows:
+            for row_num in deleted_rows:
                 print(f"削除成功: {row_num}行目の記録を削除しました。")
         else:
             print("削除対象の記録が見つかりませんでした。")
@@ -558,6 +862,9 @@ async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
 
 @client.event
 async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
+    event_dispatcher.submit(payload.message_id, handle_message_delete, payload)
+
+async def handle_message_delete(payload: discord.RawMessageDeleteEvent):
     """
     Discordでメッセージが削除された際に、関連するデータを削除する
     """
@@ -565,19 +872,8 @@ async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
     
     # --- /log メッセージの削除処理 ---
     try:
-        # GroupLogsシートから、削除されたメッセージの情報を探す
-        group_log_cell = group_log_worksheet.find(message_id, in_column=1)
-        if group_log_cell:
-            # 作業記録シート(シート1)から、関連するログを全て削除
-            all_log_cells = log_worksheet.findall(message_id, in_column=7) # G列(Message ID)を検索
-            # 見つかった行を逆順に削除 (行がずれるのを防ぐため)
-            for cell in reversed(all_log_cells):
-                log_worksheet.delete_rows(cell.row)
-            
+        if await run_log_sheet_write(_delete_group_log, message_id):
             print(f"/logメッセージ削除: Message ID {message_id} に関連する全ての記録を削除しました。")
-
-            # GroupLogsシートからも管理用の行を削除
-            group_log_worksheet.delete_rows(group_log_cell.row)
             return
             
     except gspread.exceptions.CellNotFound:
@@ -587,9 +883,7 @@ async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
 
     # --- /schedule メッセージの削除処理 ---
     try:
-        schedule_cell = schedule_worksheet.find(message_id, in_column=1)
-        if schedule_cell:
-            schedule_worksheet.delete_rows(schedule_cell.row)
+        if await run_sheet_write(_delete_schedule, message_id):
             print(f"スケジュールメッセージ削除: Message ID {message_id} の行をSchedulesシートから削除しました。")
             return
     except gspread.exceptions.CellNotFound: